@@ -3,28 +3,87 @@
 # 111304945
 # Kaggle shared task username: Avik Kadakia
 
+import atexit
 import csv
 import multiprocessing
-from nltk.tokenize import word_tokenize
+import os
+import re
+import tempfile
 import numpy as np
 from sklearn.linear_model import Ridge
 from sklearn.metrics import mean_absolute_error as MAE
 from sklearn.model_selection import train_test_split
 from sklearn.decomposition import PCA
 import scipy.stats as ss
+from scipy import linalg, sparse
 from gensim.models import Word2Vec
 import torch
 import torch.nn as nn
 from torch.utils.data import TensorDataset, DataLoader
 import sys
 import pandas as pd
-import nltk
-nltk.download('punkt')
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+# Words for the averaged Word2Vec features, compiled once
+token_pattern = re.compile(r"[A-Za-z][A-Za-z']+")
 
 ##########################################################################################
 # Stage 1
 
 
+def tokenizeReview(text):
+    """
+    Lower cases and tokenizes a single review.
+
+    Attributes
+    ----------
+    text : str
+        The review text. Anything else (i.e. a missing review) is
+        treated as an empty review.
+
+    Returns
+    -------
+    tokens : list
+        The tokens of the review.
+    """
+
+    if not isinstance(text, str):
+        return []
+
+    return token_pattern.findall(text.lower())
+
+
+def readColumns(fileName, test=False):
+    """
+    Reads only the columns that are used from a reviews file.
+
+    Attributes
+    ----------
+    fileName : str
+        The name of the csv file to open.
+    test: boolean
+        The boolean stating if the data is for testing, in which
+        case the ratings are missing.
+
+    Returns
+    -------
+    dataFile : DataFrame
+        The id, rating, user_id and reviewText columns, in that order.
+    """
+
+    dtype = {'id': 'int32', 'user_id': 'category', 'reviewText': 'string'}
+
+    if not test:
+        dtype['rating'] = 'int8'
+
+    return pd.read_csv(fileName, sep=',', usecols=[0, 1, 4, 5], dtype=dtype)
+
+
 def readCSV(fileName, test=False):
     """
     Reads in the files and stores them for future use.
@@ -47,27 +106,16 @@ def readCSV(fileName, test=False):
     Step 1.2: Tokenize the file. You may now use any existing tokenizer.
     """
 
-    dataFile = pd.read_csv(fileName, sep=',')
-    item_ids = []
-    ratings = []
-    reviews = []
-    user_ids = []
-    
-    for _, line in dataFile.iterrows():
+    dataFile = readColumns(fileName, test)
 
-        if test:
-            item_ids.append(int(line[0]))
-            user_ids.append(line[4])
+    # Pull whole columns once instead of building a Series per row
+    item_ids = dataFile.iloc[:, 0].tolist()
+    ratings = [] if test else dataFile.iloc[:, 1].to_numpy(np.int32)
+    user_ids = dataFile.iloc[:, 2].tolist()
+    texts = dataFile.iloc[:, 3].tolist()
 
-            # Tokenizes the reviews
-            reviews.append(word_tokenize(
-                line[5].lower()) if type(line[5]) == str else "")
-        else:
-            item_ids.append(int(line[0]))
-            ratings.append(int(line[1]))
-            user_ids.append(line[4])
-            reviews.append(word_tokenize(
-                line[5].lower()) if type(line[5]) == str else "")
+    # Tokenizes the reviews
+    reviews = [tokenizeReview(text) for text in texts]
 
     return [item_ids, reviews, ratings, user_ids]
 
@@ -92,17 +140,29 @@ def trainWord2VecModel(reviews, cores=2, min_count=3):
               word2vec model utilizing only the training data.
     """
 
-    w2v_model = Word2Vec(sentences=reviews,
-                         workers=cores-1,
+    # Write the reviews out once so gensim can read the corpus with one
+    # reader per worker instead of feeding every worker from this thread
+    corpus = tempfile.NamedTemporaryFile(mode='w', suffix='.txt',
+                                         delete=False, encoding='utf-8')
+    atexit.register(os.remove, corpus.name)
+
+    with corpus:
+        corpus.write('\n'.join(' '.join(review) for review in reviews))
+
+    w2v_model = Word2Vec(corpus_file=corpus.name,
+                         workers=cores,
                          window=5,
                          alpha=0.03,
-                         negative=0,
+                         negative=5,
+                         hs=0,
+                         sample=1e-4,
                          min_count=min_count,
                          seed=42,
                          size=128)
 
-    w2v_model.train(sentences=reviews,
+    w2v_model.train(corpus_file=corpus.name,
                     total_examples=w2v_model.corpus_count,
+                    total_words=w2v_model.corpus_total_words,
                     epochs=60)
 
     w2v_model.init_sims()
@@ -110,7 +170,72 @@ def trainWord2VecModel(reviews, cores=2, min_count=3):
     return w2v_model
 
 
-def getFeatures(w2v_model, reviews):
+def getVocabIndex(w2v_model):
+    """
+    Returns a hashed lookup from each word to its row in the Word2Vec vectors.
+
+    Attributes
+    ----------
+    w2v_model : Word2Vec model
+        A trained Word2Vec model.
+
+    Returns
+    -------
+    vocab : dict
+        A dictionary mapping every word in the vocabulary to its index.
+    """
+
+    return {word: entry.index for word, entry in w2v_model.wv.vocab.items()}
+
+
+def averageEmbeddings(W, flat_idx, offsets, counts, lengths, out):
+    """
+    Averages the embedding rows of every review into out. Compiled with
+    Numba when it is installed, so the reviews are summed in parallel
+    without building the gathered (words x 128) matrix.
+
+    Attributes
+    ----------
+    W : Numpy Array
+        The Word2Vec vectors.
+
+    flat_idx : Numpy Array
+        The vocabulary indices of the known words of all reviews.
+
+    offsets : Numpy Array
+        Where each review starts in flat_idx.
+
+    counts : Numpy Array
+        The number of known words in each review.
+
+    lengths : Numpy Array
+        The number of words in each review.
+
+    out : Numpy Array
+        The array the averaged features are written to.
+    """
+
+    for i in prange(offsets.shape[0]):
+        start = offsets[i]
+        scale = np.float32(1.0 / max(lengths[i], 1))
+        acc = np.zeros(W.shape[1], np.float32)
+
+        # Add whole rows so each word's vector is read once, contiguously
+        for k in range(counts[i]):
+            row = W[flat_idx[start + k]]
+
+            for j in range(W.shape[1]):
+                acc[j] += row[j]
+
+        out[i] = acc * scale
+
+
+if njit is not None:
+    averageEmbeddings = njit(parallel=True, fastmath=True,
+                             cache=True)(averageEmbeddings)
+
+
+def getFeatures(w2v_model, reviews, vocab=None):
     """
     Returns the extracted features from the Word2Vec model.
 
@@ -122,6 +247,10 @@ def getFeatures(w2v_model, reviews):
     reviews : list
         A list of all the reviews.
 
+    vocab : dict
+        The word to index lookup from getVocabIndex. Built from the
+        model when not given.
+
     Returns
     -------
     train_x : Numpy Array
@@ -134,23 +263,39 @@ def getFeatures(w2v_model, reviews):
               get a representation for each word per review.
     """
 
-    train_x = []
+    if vocab is None:
+        vocab = getVocabIndex(w2v_model)
 
-    for review in reviews:
-        temp = [0] * 128
+    W = np.ascontiguousarray(w2v_model.wv.vectors, dtype=np.float32)
 
-        for word in review:
-            if word in w2v_model.wv.index2word:
-                temp += w2v_model.wv[word]
+    # Flatten the in-vocabulary word indices of every review into one array
+    counts = np.zeros(len(reviews), dtype=np.int64)
+    lengths = np.zeros(len(reviews), dtype=np.int64)
+    flat_idx = []
 
-        temp = np.asarray(temp)
+    for pos, review in enumerate(reviews):
+        review_idx = [vocab[word] for word in review if word in vocab]
+        flat_idx.extend(review_idx)
+        counts[pos] = len(review_idx)
+        lengths[pos] = len(review)
 
-        if(len(review) > 0):
-            train_x.append(temp/len(review))
-        else:
-            train_x.append(temp)
+    flat_idx = np.fromiter(flat_idx, dtype=np.int32, count=len(flat_idx))
+    offsets = np.cumsum(counts) - counts
+
+    if njit is not None:
+        train_x = np.empty((len(reviews), W.shape[1]), dtype=np.float32)
+        averageEmbeddings(W, flat_idx, offsets, counts, lengths, train_x)
+        return train_x
 
-    return np.asarray(train_x)
+    # Row i of C holds 1 / len(review) for each known word of review i,
+    # so all the averages come out of one sparse-dense product C @ W.
+    # Reviews without any known word are empty rows and give zeros.
+    weights = np.repeat(1 / np.maximum(lengths, 1), counts).astype(np.float32)
+    indptr = np.r_[0, np.cumsum(counts)]
+    C = sparse.csr_matrix((weights, flat_idx, indptr),
+                          shape=(len(reviews), W.shape[0]))
+
+    return np.asarray(C @ W, dtype=np.float32)
 
 
 def buildRatingPredictor(train_x, train_y):
@@ -177,25 +322,33 @@ def buildRatingPredictor(train_x, train_y):
 
     listAlpha = [0.0001, 0.001, 0.01, 0.1, 1, 10, 100]
     minAccuracy = 1
-    bestModel = None
-    best_pearsonr = 0.35
 
     X_train, X_test, Y_train, Y_test = train_test_split(
         train_x, train_y, test_size=0.20, random_state=42)
 
-    for alpha in listAlpha:
+    # Only alpha changes between the models, so solve every Ridge fit
+    # from a single SVD of the centered training data:
+    # w = V * diag(s / (s^2 + alpha)) * U^T * y
+    X_mean = X_train.mean(axis=0)
+    Y_mean = Y_train.mean()
+    U, S, Vt = linalg.svd(X_train - X_mean, full_matrices=False)
+    UTy = U.T @ (Y_train - Y_mean)
+
+    alphas = np.asarray(listAlpha, dtype=S.dtype)[:, None]
+    weights = Vt.T @ (S / (S ** 2 + alphas) * UTy).T
+
+    # Predictions for every alpha in a single matrix product
+    all_pred = (X_test - X_mean) @ weights + Y_mean
+
+    for pos, alpha in enumerate(listAlpha):
 
-        model = Ridge(random_state=42, alpha=alpha).fit(X_train, Y_train)
-        Y_pred = model.predict(X_test)
+        Y_pred = all_pred[:, pos]
 
         acc = MAE(Y_test, Y_pred)
-        pearsonr = ss.pearsonr(Y_test, Y_pred)
 
         if acc < 1 and acc < minAccuracy:
 
             minAccuracy = acc
-            bestModel = model
-            best_pearsonr = pearsonr[0]
             bestAlpha = alpha
 
     return bestAlpha
@@ -204,65 +357,46 @@ def buildRatingPredictor(train_x, train_y):
 # Stage 2
 
 
-def getUserBackground(files):
+def getUserBackground(datasets):
     """
     Gets the user background for each user.
 
     Attributes
     ----------
-    files : list
-        A list containing the training file path and trial file path.
+    datasets : list
+        The training and trial data, as returned by readCSV.
 
     Returns
     -------
     users : list
-        A list containing all the reviews and ratings grouped by users.
+        Every user id, in the order they first appear.
 
     Steps
     -----
     Step 2.1: Grab the user_ids for both datasets.
     """
 
-    ratings = []
-    reviews = []
-    item_ids = []
     user_ids = []
 
-    for file in files:
-        dataFile = pd.read_csv(file, sep=',')
-
-        for _, line in dataFile.iterrows():
-
-            user = line[4]
-
-            if user in user_ids:
-                position = user_ids.index(user)
+    for data in datasets:
+        user_ids.extend(data[3])
 
-                item_ids[position].append(int(line[0]))  # Item ids
-                ratings[position].append(int(line[1]))  # ratings
-                reviews[position].append(word_tokenize(line[5].lower())
-                                         if type(line[5]) == str else "")  # Reviews
-
-            else:
-                user_ids.append(user)
-                position = user_ids.index(user)
-
-                item_ids.append([int(line[0])])  # Item ids
-                ratings.append([int(line[1])])  # ratings
-                reviews.append([word_tokenize(line[5].lower())
-                                if type(line[5]) == str else ""])  # Reviews
-
-    return [user_ids, item_ids, ratings, reviews]
+    return list(dict.fromkeys(user_ids))
 
 
-def getUserLangRepresentation(model, users):
+def getUserLangRepresentation(features, user_ids, users):
     """
-    Returns the user features from the Word2Vec model and the user's reviews.
+    Returns the user features from the already extracted review features.
 
     Attributes
     ----------
-    w2v_model : Word2Vec model
-        A trained Word2Vec model.
+    features : Numpy Array
+        The averaged Word2Vec features of every review, as returned
+        by getFeatures.
+
+    user_ids : list
+        The user id of every row in features. Every user in users
+        needs at least one row.
 
     users : list
         A list of all the users.
@@ -282,24 +416,26 @@ def getUserLangRepresentation(model, users):
               "user-language representations".
     """
 
-    user_lang_rep = []
-
-    for reviews in users[3]:
-        temp_features = getFeatures(model, reviews)
-        temp_array = [0] * 128
+    # Sort the rows by user so each user's reviews are contiguous, then
+    # sum every user's segment in one pass
+    user_pos = {user: i for i, user in enumerate(users)}
+    user_idx = np.fromiter((user_pos[user] for user in user_ids),
+                           dtype=np.int64, count=len(user_ids))
 
-        for row in temp_features:
-            temp_array += row
+    order = np.argsort(user_idx, kind='stable')
+    breaks = np.flatnonzero(np.diff(user_idx[order])) + 1
+    starts = np.r_[0, breaks]
 
-        user_lang_rep.append(temp_array/len(temp_features))
+    user_lang_rep = np.add.reduceat(features[order], starts, axis=0)
+    counts = np.diff(np.r_[starts, len(order)])
+    user_lang_rep /= counts[:, None]
 
     return user_lang_rep
 
 
 def runPCAMatrix(user_reviews):
     """
-    Converts the user review's 128 dimensional features to 3 dimensional 
-    transformation matrix.
+    Reduces the user review's 128 dimensional features to 3 user factors.
 
     Attributes
     ----------
@@ -308,8 +444,13 @@ def runPCAMatrix(user_reviews):
 
     Returns
     -------
+    pca : PCA
+        The fitted PCA. It holds the 3 dimensional transformation
+        matrix (V), used to project new data without refitting.
+
     v_matrix : Numpy Array
-        An array containing the 3 dimensional transformation matrix.
+        An array containing the 3 user factors of each user, i.e. the
+        user features projected with V.
 
     Steps
     -----
@@ -321,11 +462,15 @@ def runPCAMatrix(user_reviews):
               training).
     """
 
-    return (PCA(n_components=3, random_state=42).fit(user_reviews)).transform(user_reviews)
+    # Only three components are needed, so a randomized SVD is enough
+    pca = PCA(n_components=3, svd_solver='randomized',
+              random_state=42).fit(user_reviews)
+
+    return pca, pca.transform(user_reviews)
 
 
 def PCA_feature_vector(X_train, X_test, review_training_data, review_trial_data,
-                       review_testing_data, user_data, file, v_matrix):
+                       review_testing_data, user_data, file, v_matrix, pca):
     """
     Converts the user review's 128 dimensional features to 3 dimensional 
     transformation matrix.
@@ -348,13 +493,17 @@ def PCA_feature_vector(X_train, X_test, review_training_data, review_trial_data,
         A list containing all the reviews and ratings for testing.
 
     user_data : list
-        Reviews per user.
+        The user ids from getUserBackground.
 
     file : str
         File name.
 
     v_matrix : list
-        An array containing the 3 dimensional transformation matrix.
+        An array containing the 3 user factors of each user in user_data.
+
+    pca : PCA
+        The fitted PCA from runPCAMatrix. Users that are not in
+        user_data are projected with it instead of refitting.
 
     Returns
     -------
@@ -368,43 +517,64 @@ def PCA_feature_vector(X_train, X_test, review_training_data, review_trial_data,
               using the same approach as stage 1.
     """
 
-    feature_vector = []
+    # Position lookups built once instead of a list.index() per row
+    train_pos = {id_: i for i, id_ in enumerate(review_training_data[0])}
+    trial_pos = {id_: i for i, id_ in enumerate(review_trial_data[0])}
+    test_pos = {} if review_testing_data is None else {
+        id_: i for i, id_ in enumerate(review_testing_data[0])}
+    user_pos = {user: i for i, user in enumerate(user_data)}
 
-    dataFile = pd.read_csv(file, sep=',')
-    
-    for _, line in dataFile.iterrows():
+    dataFile = readColumns(file, test=True)
+    item_col = dataFile.iloc[:, 0].tolist()
+    user_col = dataFile.iloc[:, 2].tolist()
 
-        temp_feature_vector = []
-        item_id = line[0]
-        user_id = line[4]
+    embeddings = []
 
-        if item_id in review_training_data[0]:
-            position = review_training_data[0].index(item_id)
-            review_embedding = X_train[position]
+    for item_id in item_col:
 
-        elif item_id in review_trial_data[0]:
-            position = review_trial_data[0].index(item_id)
-            review_embedding = X_test[position]
+        if item_id in train_pos:
+            review_embedding = X_train[train_pos[item_id]]
 
-        elif review_testing_data != None and item_id in review_testing_data[0]:
-            position = review_testing_data[0].index(item_id)
-            review_embedding = X_test[position]
+        elif item_id in trial_pos:
+            review_embedding = X_test[trial_pos[item_id]]
 
-        if user_id in user_data[0]:
-            position = user_data[0].index(user_id)
-            user_factor = v_matrix[position]
+        elif item_id in test_pos:
+            review_embedding = X_test[test_pos[item_id]]
 
-        else:
-            user_factor = [1] * 3
+        embeddings.append(review_embedding)
+
+    # Users without a background get their factors from the average of
+    # their reviews in this file, projected with the saved V
+    new_user_rows = {}
+
+    for row, user_id in enumerate(user_col):
+        if user_id not in user_pos:
+            new_user_rows.setdefault(user_id, []).append(row)
+
+    new_user_factors = {}
 
-        for vector in user_factor:
-            temp_feature_vector.append(review_embedding * vector)
+    if new_user_rows:
+        new_user_rep = np.array([np.mean([embeddings[row] for row in rows], axis=0)
+                                 for rows in new_user_rows.values()])
+        new_user_factors = dict(zip(new_user_rows, pca.transform(new_user_rep)))
 
-        temp_feature_vector.append(review_embedding)
-        flattened_array = np.ndarray.flatten(np.array(temp_feature_vector))
-        feature_vector.append(flattened_array)
+    dim = X_train.shape[1]
+
+    # Every row is [embedding * f1, embedding * f2, embedding * f3, embedding]
+    feature_vector = np.empty((len(item_col), 4 * dim), dtype=np.float32)
+
+    for pos, (review_embedding, user_id) in enumerate(zip(embeddings, user_col)):
+
+        if user_id in user_pos:
+            user_factor = v_matrix[user_pos[user_id]]
+
+        else:
+            user_factor = new_user_factors[user_id]
+
+        row = feature_vector[pos].reshape(4, dim)
+        row[:3] = np.multiply.outer(user_factor, review_embedding)
+        row[3] = review_embedding
 
-    feature_vector = np.array(feature_vector)
     return feature_vector
 
 ##########################################################################################
@@ -444,10 +614,9 @@ def build_dataloader(embeddings, ratings, bs, shfle, workers):
               from stage 1.
     """
 
-    embeddings = list(embeddings)
-    embeddings = [list(item) for item in embeddings]
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
 
-    dataset = TensorDataset(torch.tensor(embeddings), torch.tensor(ratings))
+    dataset = TensorDataset(torch.from_numpy(embeddings), torch.as_tensor(ratings))
 
     return DataLoader(dataset, batch_size=bs, shuffle=shfle, num_workers=workers)
 
@@ -564,34 +733,34 @@ if __name__ == '__main__':
 
     print("\nStage 1 Checkpoint:\n")
 
+    cores = multiprocessing.cpu_count()
+
     # Stage 1.1: Read the reviews and ratings from the file
 
     training_data = readCSV(training_file)
     trial_data = readCSV(trial_file)
+    id_to_pos = {id_: i for i, id_ in enumerate(trial_data[0])}
 
     # Stage 1.3: Use GenSim word2vec to train a 128-dimensional word2vec
     #            model utilizing only the training data
 
-    cores = multiprocessing.cpu_count()
-
     if "food_" in trial_file:
         train_w2v_model = trainWord2VecModel(training_data[1], cores)
-        trial_w2v_model = trainWord2VecModel(trial_data[1], cores)
 
     if "music_" in trial_file:
         train_w2v_model = trainWord2VecModel(training_data[1], cores, 5)
-        trial_w2v_model = trainWord2VecModel(trial_data[1], cores, 5)
 
     if "musicAndPetsup_" in trial_file:
         train_w2v_model = trainWord2VecModel(training_data[1], cores, 10)
-        trial_w2v_model = trainWord2VecModel(trial_data[1], cores, 10)
 
     # Stage 1.4: Extract features
 
-    train_x = getFeatures(train_w2v_model, training_data[1])
-    test_x = getFeatures(trial_w2v_model, trial_data[1])
-    train_y = np.asarray(training_data[2], dtype=np.int)
-    test_y = np.asarray(trial_data[2], dtype=np.int)
+    # Built once and shared by both splits instead of once per call
+    vocab = getVocabIndex(train_w2v_model)
+    train_x = getFeatures(train_w2v_model, training_data[1], vocab)
+    test_x = getFeatures(train_w2v_model, trial_data[1], vocab)
+    train_y = np.asarray(training_data[2], dtype=np.float32)
+    test_y = np.asarray(trial_data[2], dtype=np.float32)
 
     # Stage 1.5: Build a rating predictor
 
@@ -619,25 +788,25 @@ if __name__ == '__main__':
     if "food_" in trial_file:
         testCases = [548, 4258, 4766, 5800]
         for case in testCases:
-            if case in trial_data[0]:
-                pos = trial_data[0].index(case)
+            pos = id_to_pos.get(case)
+            if pos is None:
+                print(case, "not in", trial_file)
+            else:
                 print()
                 print(case, "\tPredicted Value",
                       y_pred[pos], "\tTrue Value:", trial_data[2][pos])
-            else:
-                print(case, "not in", trial_file)
 
     if "music_" in trial_file:
         testCases = [329, 11419, 14023, 14912]
 
         for case in testCases:
-            if case in trial_data[0]:
-                pos = trial_data[0].index(case)
+            pos = id_to_pos.get(case)
+            if pos is None:
+                print(case, "not in", trial_file)
+            else:
                 print()
                 print(case, "\tPredicted Value",
                       y_pred[pos], "\tTrue Value:", trial_data[2][pos])
-            else:
-                print(case, "not in", trial_file)
     
     
     # Stage II: User-Factor Adaptation
@@ -645,27 +814,30 @@ if __name__ == '__main__':
     print("\n\nStage 2 Checkpoint:\n")
 
     # Stage 2.1: Grab the user_ids for both datasets.
-    users = getUserBackground([training_file, trial_file])
+    users = getUserBackground([training_data, trial_data])
 
     # Stage 2.2 For each user, treat their training data as "background" in order
     #           to learn user factors: average all of their word2vec features over
     #           the training data to treat as 128-dimensional
     #           "user-language representations".
-    user_lang_rep = getUserLangRepresentation(train_w2v_model, users)
+    user_lang_rep = getUserLangRepresentation(
+        np.concatenate((train_x, test_x)), training_data[3] + trial_data[3], users)
 
     # Stage 2.3: Run PCA the matrix of user-language representations to reduce down
     #            to just three factors. Save the 3 dimensional transformation matrix
     #            (V) so that you may apply it to new data (i.e. the trial or test set
     #            when predicting -- when predicting you should not run PCA again;
     #            only before training).
-    v_matrix = runPCAMatrix(user_lang_rep)
+    pca, v_matrix = runPCAMatrix(user_lang_rep)
 
     # Stage 2.4: Use the first three factors from PCA as user factors in order to run
     #            user-factor adaptation, otherwise using the same approach as stage 1.
     train_x_2 = PCA_feature_vector(
-        train_x, test_x, training_data, trial_data, None, users, training_file, v_matrix)
+        train_x, test_x, training_data, trial_data, None, users, training_file,
+        v_matrix, pca)
     test_x_2 = PCA_feature_vector(
-        train_x, test_x, training_data, trial_data, None, users, trial_file, v_matrix)
+        train_x, test_x, training_data, trial_data, None, users, trial_file,
+        v_matrix, pca)
 
     bestALpha = buildRatingPredictor(train_x_2, train_y)
     rating_model = Ridge(random_state=42, alpha=bestALpha).fit(
@@ -689,25 +861,25 @@ if __name__ == '__main__':
         testCases = [548, 4258, 4766, 5800]
 
         for case in testCases:
-            if case in trial_data[0]:
-                pos = trial_data[0].index(case)
+            pos = id_to_pos.get(case)
+            if pos is None:
+                print(case, "not in", trial_file)
+            else:
                 print()
                 print(case, "\tPredicted Value",
                       y_pred[pos], "\tTrue Value:", trial_data[2][pos])
-            else:
-                print(case, "not in", trial_file)
 
     if "music_" in trial_file:
         testCases = [329, 11419, 14023, 14912]
 
         for case in testCases:
-            if case in trial_data[0]:
-                pos = trial_data[0].index(case)
+            pos = id_to_pos.get(case)
+            if pos is None:
+                print(case, "not in", trial_file)
+            else:
                 print()
                 print(case, "\tPredicted Value",
                       y_pred[pos], "\tTrue Value:", trial_data[2][pos])
-            else:
-                print(case, "not in", trial_file)
     
     
     # Stage III: Deep Learning